@@ -3,7 +3,8 @@
 # reference implementation:
 # https://github.com/bitcoin/bips/blob/master/bip-0340/reference.py
 
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
+from functools import lru_cache
 import hashlib
 
 p = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
@@ -15,11 +16,18 @@ G = (0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798, 0x483AD
 
 Point = Tuple[int, int]
 
-# This implementation can be sped up by storing the midstate after hashing
-# tag_hash instead of rehashing it all the time.
-def tagged_hash(tag: str, msg: bytes) -> bytes:
+# Unlike the BIP-340 reference implementation, we store the midstate after
+# hashing tag_hash instead of rehashing it all the time. tagged_hash only ever
+# updates a copy of the cached midstate.
+@lru_cache(maxsize=64)
+def _tagged_hash_midstate(tag: str) -> 'hashlib._Hash':
     tag_hash = hashlib.sha256(tag.encode()).digest()
-    return hashlib.sha256(tag_hash + tag_hash + msg).digest()
+    return hashlib.sha256(tag_hash + tag_hash)
+
+def tagged_hash(tag: str, msg: bytes) -> bytes:
+    h = _tagged_hash_midstate(tag).copy()
+    h.update(msg)
+    return h.digest()
 
 def is_infinite(P: Optional[Point]) -> bool:
     return P is None
@@ -47,6 +55,8 @@ def point_add(P1: Optional[Point], P2: Optional[Point]) -> Optional[Point]:
     return (x3, (lam * (x(P1) - x3) - y(P1)) % p)
 
 def point_mul(P: Optional[Point], n: int) -> Optional[Point]:
+    if P == G:
+        return point_mul_G(n)
     R = None
     for i in range(256):
         if (n >> i) & 1:
@@ -54,6 +64,30 @@ def point_mul(P: Optional[Point], n: int) -> Optional[Point]:
         P = point_add(P, P)
     return R
 
+# The precomputed table of multiples of G is not part of the BIP-340 reference
+# implementation. G_TABLE[i][j] is (j * 2^(G_WINDOW*i)) * G, which allows
+# computing multiples of G with 256/G_WINDOW point additions and no doublings.
+G_WINDOW = 4
+
+def precompute_G_table() -> List[List[Optional[Point]]]:
+    table = []
+    B: Optional[Point] = G
+    for i in range(256 // G_WINDOW):
+        row: List[Optional[Point]] = [None]
+        for j in range(1, 2**G_WINDOW):
+            row.append(point_add(row[-1], B))
+        table.append(row)
+        B = point_add(row[-1], B)
+    return table
+
+G_TABLE = precompute_G_table()
+
+def point_mul_G(n: int) -> Optional[Point]:
+    R = None
+    for i in range(256 // G_WINDOW):
+        R = point_add(R, G_TABLE[i][(n >> (G_WINDOW*i)) & (2**G_WINDOW - 1)])
+    return R
+
 def bytes_from_int(x: int) -> bytes:
     return x.to_bytes(32, byteorder="big")
 
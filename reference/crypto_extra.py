@@ -64,3 +64,16 @@ def scalar_add_multi(scalars: List[int]) -> int:
     for scalar in scalars:
         acc = (acc + scalar) % n
     return acc
+
+# Return scalars[0]*points[0] + ... + scalars[k-1]*points[k-1] using Straus'
+# algorithm, which shares the point doublings among all terms
+def point_mul_multi(scalars: List[int], points: List[Optional[Point]]) -> Optional[Point]:
+    assert(len(scalars) == len(points))
+    R = None
+    bits = max([scalar.bit_length() for scalar in scalars], default=0)
+    for i in range(bits - 1, -1, -1):
+        R = point_add(R, R)
+        for scalar, P in zip(scalars, points):
+            if (scalar >> i) & 1:
+                R = point_add(R, P)
+    return R
@@ -1,8 +1,8 @@
 # Reference implementation of BIP DKG. This file is automatically generated by
 # reference_py_gen.sh.
 
-from crypto_bip340 import n as GROUP_ORDER, Point, G, point_mul, schnorr_sign, schnorr_verify, tagged_hash, pubkey_gen, int_from_bytes, bytes_from_int
-from crypto_extra import pubkey_gen_plain, point_add_multi, scalar_add_multi, cpoint, xbytes, cbytes, cbytes_ext
+from crypto_bip340 import n as GROUP_ORDER, Point, G, point_mul, schnorr_sign, schnorr_verify, tagged_hash, pubkey_gen, int_from_bytes, bytes_from_int, lift_x
+from crypto_extra import pubkey_gen_plain, point_add_multi, point_mul_multi, scalar_add_multi, cpoint, xbytes, cbytes, cbytes_ext
 from typing import Tuple, List, Optional, Callable, Any, Union, Dict, Coroutine
 from network import SignerChannel, CoordinatorChannels
 from util import *
@@ -54,9 +54,8 @@ def vss_commit(f: Polynomial) -> VSSCommitment:
 
 def vss_verify(signer_idx: int, share: Scalar, vss_commitment: VSSCommitment) -> bool:
     P = point_mul(G, share)
-    Q = [point_mul(vss_commitment[j], pow(signer_idx + 1, j) % GROUP_ORDER) \
-         for j in range(0, len(vss_commitment))]
-    return P == point_add_multi(Q)
+    powers = [pow(signer_idx + 1, j, GROUP_ORDER) for j in range(0, len(vss_commitment))]
+    return P == point_mul_multi(powers, vss_commitment)
 
 # An extended VSS Commitment is a VSS commitment with a proof of knowledge
 VSSCommitmentExt = Tuple[VSSCommitment, bytes]
@@ -83,8 +82,11 @@ def derive_group_info(vss_commitment: VSSCommitment, n: int, t: int) -> Tuple[Op
   pk = vss_commitment[0]
   participant_public_keys = []
   for signer_idx in range(0, n):
-    pk_i = point_add_multi([point_mul(vss_commitment[j], pow(signer_idx + 1, j) % GROUP_ORDER) \
-                            for j in range(0, len(vss_commitment))])
+    # pk_i = sum_j vss_commitment[j] * (signer_idx + 1)^j is computed with a
+    # single multi-scalar multiplication. The powers are small for small
+    # indices, which keeps the number of point doublings low.
+    powers = [pow(signer_idx + 1, j, GROUP_ORDER) for j in range(0, len(vss_commitment))]
+    pk_i = point_mul_multi(powers, vss_commitment)
     participant_public_keys += [pk_i]
   return pk, participant_public_keys
 
@@ -156,12 +158,12 @@ def ecdh(deckey: bytes, enckey: bytes, context: bytes) -> Scalar:
     assert Z is not None
     return int_from_bytes(tagged_hash_bip_dkg("ECDH", cbytes(Z) + context))
 
-def encrypt(share: Scalar, my_deckey: bytes, enckey: bytes, context: bytes) -> Scalar:
-    return (share + ecdh(my_deckey, enckey, context)) % GROUP_ORDER
+def encrypt(share: Scalar, ecdh_key: Scalar) -> Scalar:
+    return (share + ecdh_key) % GROUP_ORDER
 
 # TODO Add `aggregate` and `decrypt` algorithms for better readability/encapsulation.
 
-EncPedPopR1State = Tuple[int, bytes, List[bytes], SimplPedPopR1State]
+EncPedPopR1State = Tuple[int, Scalar, List[bytes], SimplPedPopR1State]
 
 def encpedpop_round1(seed: bytes, t: int, n: int, my_deckey: bytes, enckeys: List[bytes], my_idx: int) -> Tuple[EncPedPopR1State, VSSCommitmentExt, List[Scalar]]:
     assert(t < 2**(4*8))
@@ -174,21 +176,24 @@ def encpedpop_round1(seed: bytes, t: int, n: int, my_deckey: bytes, enckeys: Lis
 
     simpl_state, vss_commitment_ext, gen_shares = simplpedpop_round1(seed_, t, n, my_idx)
     assert(len(gen_shares) == n)
-    enc_gen_shares = [encrypt(gen_shares[i], my_deckey, enckeys[i], enc_context) for i in range(n)]
-    state2 = (t, my_deckey, enckeys, simpl_state)
+    # ECDH is symmetric, so the key for encrypting our share to participant i
+    # is the same as the key for decrypting the share from participant i.
+    # We compute every ECDH key, which involves decompressing the enckey, only
+    # once and keep their sum in the state for encpedpop_pre_finalize.
+    ecdh_keys = [ecdh(my_deckey, enckeys[i], enc_context) for i in range(n)]
+    enc_gen_shares = [encrypt(gen_shares[i], ecdh_keys[i]) for i in range(n)]
+    state2 = (t, scalar_add_multi(ecdh_keys), enckeys, simpl_state)
     return state2, vss_commitment_ext, enc_gen_shares
 
 def encpedpop_pre_finalize(state2: EncPedPopR1State, vss_commitments_sum: VSSCommitmentSum, enc_shares_sum: Scalar) -> Tuple[bytes, DKGOutput]:
-    t, my_deckey, enckeys, simpl_state = state2
+    t, ecdh_keys_sum, enckeys, simpl_state = state2
     n = len(enckeys)
 
     assert(len(vss_commitments_sum) == 2)
     assert(len(vss_commitments_sum[0]) == n + t - 1)
     assert(len(vss_commitments_sum[1]) == n)
 
-    enc_context = t.to_bytes(4, byteorder="big") + b''.join(enckeys)
-    ecdh_keys = [ecdh(my_deckey, enckeys[i], enc_context) for i in range(n)]
-    shares_sum = (enc_shares_sum - scalar_add_multi(ecdh_keys)) % GROUP_ORDER
+    shares_sum = (enc_shares_sum - ecdh_keys_sum) % GROUP_ORDER
     eta, dkg_output = simplpedpop_pre_finalize(simpl_state, vss_commitments_sum, shares_sum)
     # TODO: for recpedpop this is unnecessary because the hostpubkeys are already
     # included in eta via setup_id.
@@ -235,7 +240,10 @@ def recpedpop_pre_finalize(seed: bytes, state2: RecPedPopR1State, vss_commitment
     # participate in Eq?
     my_enc_shares_sum = all_enc_shares_sum[my_idx]
     eta, dkg_output = encpedpop_pre_finalize(enc_state2, vss_commitments_sum, my_enc_shares_sum)
-    eta += setup_id + b''.join([bytes_from_int(share) for share in all_enc_shares_sum])
+    # The equality check protocol hashes its input once for every signature it
+    # creates or verifies, so we compress the (potentially large) eta into a
+    # single hash.
+    eta = tagged_hash_bip_dkg("eta", eta + setup_id + b''.join([bytes_from_int(share) for share in all_enc_shares_sum]))
     return eta, dkg_output
 
 EqualityCheck = Callable[[bytes], Coroutine[Any, Any, bool]]
@@ -256,18 +264,45 @@ async def recpedpop(chan: SignerChannel, seed: bytes, my_hostseckey: bytes, setu
     transcript = (setup, vss_commitments_sum, all_enc_shares_sum, cert)
     return (shares_sum, shared_pubkey, signer_pubkeys), transcript
 
+# Verifies all signatures in cert at once using BIP 340 batch verification,
+# i.e., checks that (a_0*s_0 + ... + a_{n-1}*s_{n-1})*G equals
+# a_0*R_0 + ... + a_{n-1}*R_{n-1} + (a_0*e_0)*P_0 + ... + (a_{n-1}*e_{n-1})*P_{n-1}
+# using a single multi-scalar multiplication instead of n verifications.
 def verify_cert(hostpubkeys: List[bytes], x: bytes, cert: bytes) -> bool:
     n = len(hostpubkeys)
     if len(cert) != 64*n:
         return False
-    is_valid = [schnorr_verify(x, hostpubkeys[i][1:33], cert[i*64:(i+1)*64]) for i in range(n)]
-    # If a signature is invalid, the signer `hpk` is either malicious or an
-    # honest signer whose input is not equal to `x`. This means that there is
-    # some malicious signer or that some messages have been tampered with on the
-    # wire. We must not abort, and we could still output True when receiving a
-    # cert later, but we should indicate to the user (logs?) that something went
-    # wrong.)
-    return all(is_valid)
+    # As suggested by BIP 340, the 128-bit coefficients a_1, ..., a_{n-1} are
+    # derived deterministically from a hash of all inputs. a_0 is fixed to 1.
+    batch_seed = tagged_hash_bip_dkg("verify_cert batch", b''.join(hostpubkeys) + x + cert)
+    scalars = []
+    points: List[Optional[Point]] = []
+    s_sum = 0
+    for i in range(n):
+        pubkey = hostpubkeys[i][1:33]
+        sig = cert[i*64:(i+1)*64]
+        P = lift_x(int_from_bytes(pubkey))
+        R = lift_x(int_from_bytes(sig[0:32]))
+        s = int_from_bytes(sig[32:64])
+        if (P is None) or (R is None) or (s >= GROUP_ORDER):
+            return False
+        e = int_from_bytes(tagged_hash("BIP0340/challenge", sig[0:32] + pubkey + x)) % GROUP_ORDER
+        if i == 0:
+            a = 1
+        else:
+            a = int_from_bytes(tagged_hash_bip_dkg("verify_cert batch coefficient", batch_seed + i.to_bytes(4, byteorder="big"))[0:16])
+        scalars += [a, (a * e) % GROUP_ORDER]
+        points += [R, P]
+        s_sum = (s_sum + a * s) % GROUP_ORDER
+    scalars += [(GROUP_ORDER - s_sum) % GROUP_ORDER]
+    points += [G]
+    # If the check fails, some signer is either malicious or an honest signer
+    # whose input is not equal to `x`. This means that there is some malicious
+    # signer or that some messages have been tampered with on the wire. We must
+    # not abort, and we could still output True when receiving a cert later,
+    # but we should indicate to the user (logs?) that something went wrong.
+    # (To identify the invalid signatures, verify them individually.)
+    return point_mul_multi(scalars, points) is None
 
 async def certifying_eq(chan: SignerChannel, my_hostseckey: bytes, hostpubkeys: List[bytes], x: bytes) -> List[bytes]:
     # TODO: fix aux_rand
@@ -283,7 +318,8 @@ async def certifying_eq_coordinate(chans: CoordinatorChannels, hostpubkeys: List
     for i in range(n):
         sig = await chans.receive_from(i)
         sigs += [sig]
-    chans.send_all(b''.join(sigs))
+    cert = b''.join(sigs)
+    chans.send_all(cert)
 
 async def recpedpop_coordinate(chans: CoordinatorChannels, t: int, hostpubkeys: List[bytes]) -> None:
     n = len(hostpubkeys)
@@ -292,7 +328,8 @@ async def recpedpop_coordinate(chans: CoordinatorChannels, t: int, hostpubkeys:
     for i in range(n):
         vss_commitment_ext, enc_shares = await chans.receive_from(i)
         vss_commitments_ext += [vss_commitment_ext]
-        all_enc_shares_sum = [ (all_enc_shares_sum[j] + enc_shares[j]) % GROUP_ORDER for j in range(n) ]
+        for j in range(n):
+            all_enc_shares_sum[j] = (all_enc_shares_sum[j] + enc_shares[j]) % GROUP_ORDER
     vss_commitments_sum = vss_sum_commitments(vss_commitments_ext, t)
     chans.send_all((vss_commitments_sum, all_enc_shares_sum))
     await certifying_eq_coordinate(chans, hostpubkeys)
@@ -1,5 +1,6 @@
 from random import randint
 import secrets
+import hashlib
 from crypto_bip340 import n as GROUP_ORDER, point_mul, G
 from crypto_extra import scalar_add_multi
 from reference import *
@@ -149,6 +150,38 @@ def test_recover_secret():
     assert(recover_secret([1,3], [shares[0], shares[2]]) == f[0])
     assert(recover_secret([2,3], [shares[1], shares[2]]) == f[0])
 
+def test_tagged_hash():
+    tag = "test tag"
+    tag_hash = hashlib.sha256(tag.encode()).digest()
+    expected = hashlib.sha256(tag_hash + tag_hash + b'msg').digest()
+    # The second call uses the cached midstate
+    assert(tagged_hash(tag, b'msg') == expected)
+    assert(tagged_hash(tag, b'msg') == expected)
+
+def test_verify_cert():
+    n = 3
+    hostkeys = [recpedpop_hostkey_gen(secrets.token_bytes(32)) for _ in range(n)]
+    hostpubkeys = [hostkey[1] for hostkey in hostkeys]
+    x = secrets.token_bytes(32)
+    cert = b''.join([schnorr_sign(x, hostkey[0], secrets.token_bytes(32)) for hostkey in hostkeys])
+    assert(verify_cert(hostpubkeys, x, cert))
+    assert(not verify_cert(hostpubkeys, secrets.token_bytes(32), cert))
+    assert(not verify_cert(hostpubkeys, x, cert[:64*(n-1)]))
+    # The signature at index 0 has a fixed batch coefficient of 1, so check
+    # separately that a signature of signer 0 for another message is rejected
+    sig_0 = schnorr_sign(secrets.token_bytes(32), hostkeys[0][0], secrets.token_bytes(32))
+    assert(not verify_cert(hostpubkeys, x, sig_0 + cert[64:]))
+    for i in range(n):
+        # Swap the signatures of signers i and i+1
+        j = (i + 1) % n
+        sigs = [cert[k*64:(k+1)*64] for k in range(n)]
+        sigs[i], sigs[j] = sigs[j], sigs[i]
+        assert(not verify_cert(hostpubkeys, x, b''.join(sigs)))
+        # Flip a bit in the s value of signer i
+        invalid_cert = bytearray(cert)
+        invalid_cert[i*64 + 63] ^= 1
+        assert(not verify_cert(hostpubkeys, x, bytes(invalid_cert)))
+
 def dkg_correctness(t, n, simulate_dkg, external_eq):
     seeds = [secrets.token_bytes(32) for _ in range(n)]
 
@@ -188,9 +221,15 @@ def dkg_correctness(t, n, simulate_dkg, external_eq):
             assert(shares_sum_ == shares[i])
             assert(shared_pubkey_ == shared_pubkeys[i])
             assert(signer_pubkeys_ == signer_pubkeys[i])
+        # recovery must fail if the cert in the transcript is invalid
+        setup, vss_commitments_sum, all_enc_shares_sum, cert = dkg_outputs[0][3]
+        invalid_cert = bytes([cert[0] ^ 1]) + cert[1:]
+        assert(recpedpop_recover(seeds[0], (setup, vss_commitments_sum, all_enc_shares_sum, invalid_cert)) == False)
 
 test_vss_correctness()
 test_recover_secret()
+test_tagged_hash()
+test_verify_cert()
 for (t, n) in [(1, 1), (1, 2), (2, 2), (2, 3), (2, 5)]:
     external_eq = True
     dkg_correctness(t, n, simulate_simplpedpop, external_eq)